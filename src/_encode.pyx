@@ -0,0 +1,46 @@
+# cython: language_level=3
+# _encode.pyx
+# Compiled instruction encoder for Variant #21 (see src/assembler.py for the
+# field layout). Build in place with `make build-ext`; the assembler falls
+# back to the Python encoder when the extension is not built.
+
+from libc.stdint cimport uint32_t
+
+
+cpdef uint32_t encode_instr_fast(long long A, long long B, long long C, long long D=0, long long E=0):
+    cdef uint32_t val
+
+    if A == 13:  # LOAD_CONST
+        val = 13 | ((<uint32_t>B & 0x7F) << 5) | ((<uint32_t>C & 0x7FF) << 12)
+    elif A == 26:  # READ_MEM
+        val = (26 | ((<uint32_t>B & 0x7F) << 5) | ((<uint32_t>C & 0x7F) << 12)
+               | ((<uint32_t>D & 0x3F) << 19))
+    elif A == 15:  # WRITE_MEM
+        val = 15 | ((<uint32_t>B & 0x7F) << 5) | ((<uint32_t>C & 0x3FFF) << 12)
+    elif A == 22:  # POW
+        val = (22 | ((<uint32_t>B & 0x7F) << 5) | ((<uint32_t>C & 0x7F) << 12)
+               | ((<uint32_t>D & 0x3F) << 19) | ((<uint32_t>E & 0x7F) << 25))
+    else:
+        raise ValueError(f"Unknown IR opcode: {A}")
+
+    return val
+
+
+def assemble_fast(ir_list):
+    """Sequence of (A, B, C, D, E) tuples -> little-endian program bytes."""
+    cdef Py_ssize_t n = len(ir_list)
+    cdef bytearray buf = bytearray(n * 4)
+    cdef unsigned char* out = buf
+    cdef Py_ssize_t i = 0
+    cdef uint32_t val
+    cdef tuple instr
+
+    for instr in ir_list:
+        val = encode_instr_fast(instr[0], instr[1], instr[2], instr[3], instr[4])
+        out[4 * i] = val & 0xFF
+        out[4 * i + 1] = (val >> 8) & 0xFF
+        out[4 * i + 2] = (val >> 16) & 0xFF
+        out[4 * i + 3] = val >> 24
+        i += 1
+
+    return bytes(buf)
@@ -1,10 +1,34 @@
 import argparse
-import csv
+import struct
+from itertools import chain
 from pathlib import Path
 
-from src.utils import pack_fields
+import numpy as np
+
+from src.csv_io import iter_program_rows
+
+try:
+    from src._encode import encode_instr_fast, assemble_fast
+except ImportError:  # extension not built (make build-ext), use the Python encoder
+    encode_instr_fast = assemble_fast = None
 
 INSTR_SIZE = 4
+_WORD = struct.Struct("<I")
+
+# field masks (n-bit: (1 << n) - 1), precomputed for encoding
+_M6 = 0x3F
+_M7 = 0x7F
+_M11 = 0x7FF
+_M14 = 0x3FFF
+
+# Version of the IR tuples and of the instruction encoding. Bump it whenever
+# to_ir or the encoders change their output: it keys the web app's compile
+# cache, so stale cached programs stop matching.
+FORMAT_VERSION = 1
+
+# Programs at least this long are encoded with numpy in a single pass;
+# for shorter ones the array setup costs more than it saves.
+VECTOR_MIN_INSTRS = 128
 
 # =========================
 # Variant #21 encoding
@@ -28,60 +52,32 @@ INSTR_SIZE = 4
 # result -> reg[C]
 
 
-def encode_instr(ir: dict) -> bytes:
-    cmd_name = ir["cmd"]
-
-    if cmd_name == "LOAD_CONST":
-        A = 13
-        B = int(ir["B"])  # reg addr
-        C = int(ir["C"])  # const
-        val = pack_fields([
-            (A, 0, 5),
-            (B, 5, 7),
-            (C, 12, 11),
-        ])
-        return val.to_bytes(INSTR_SIZE, "little")
-
-    if cmd_name == "READ_MEM":
-        A = 26
-        B = int(ir["B"])  # base reg addr
-        C = int(ir["C"])  # dest reg addr
-        D = int(ir["D"])  # offset
-        val = pack_fields([
-            (A, 0, 5),
-            (B, 5, 7),
-            (C, 12, 7),
-            (D, 19, 6),
-        ])
-        return val.to_bytes(INSTR_SIZE, "little")
-
-    if cmd_name == "WRITE_MEM":
-        A = 15
-        B = int(ir["B"])  # src reg addr
-        C = int(ir["C"])  # mem addr
-        val = pack_fields([
-            (A, 0, 5),
-            (B, 5, 7),
-            (C, 12, 14),
-        ])
-        return val.to_bytes(INSTR_SIZE, "little")
-
-    if cmd_name == "POW":
-        A = 22
-        B = int(ir["B"])  # reg addr holding address for op2
-        C = int(ir["C"])  # dest reg addr
-        D = int(ir["D"])  # offset
-        E = int(ir["E"])  # base reg addr for op1
-        val = pack_fields([
-            (A, 0, 5),
-            (B, 5, 7),
-            (C, 12, 7),
-            (D, 19, 6),
-            (E, 25, 7),
-        ])
-        return val.to_bytes(INSTR_SIZE, "little")
-
-    raise ValueError(f"Unknown IR command: {cmd_name}")
+# IR entries are tuples (A, B, C, D, E) with the opcode already resolved;
+# fields a command does not have are 0.
+
+# (C mask, D mask, E mask) per opcode, 0 = the command has no such field.
+# B is 7 bits for every command.
+_FIELD_MASKS = {
+    13: (_M11, 0, 0),
+    26: (_M7, _M6, 0),
+    15: (_M14, 0, 0),
+    22: (_M7, _M6, _M7),
+}
+
+
+def encode_instr(ir: tuple) -> int:
+    if encode_instr_fast is not None:
+        try:
+            return encode_instr_fast(*ir)
+        except OverflowError:
+            pass  # operand does not fit in 64 bits; the Python encoder masks it
+
+    A, B, C, D, E = ir
+    masks = _FIELD_MASKS.get(A)
+    if masks is None:
+        raise ValueError(f"Unknown IR opcode: {A}")
+    c_mask, d_mask, e_mask = masks
+    return A | ((B & _M7) << 5) | ((C & c_mask) << 12) | ((D & d_mask) << 19) | ((E & e_mask) << 25)
 
 
 def parse_csv_program(path: str):
@@ -89,23 +85,30 @@ def parse_csv_program(path: str):
     if not p.exists():
         raise FileNotFoundError(path)
 
-    program_rows = []
     with open(p, "r", encoding="utf-8", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row:
-                continue
-            # allow comments with leading '#'
-            first = row[0].strip()
-            if not first or first.startswith("#"):
-                continue
-            # trim all fields
-            row = [c.strip() for c in row if c is not None]
-            if len(row) == 0:
-                continue
-            program_rows.append(row)
-
-    return program_rows
+        return list(iter_program_rows(f))
+
+
+# mnemonic -> (row length incl. mnemonic, row -> IR tuple)
+_TO_IR = {
+    "LOAD_CONST": (3, lambda r: (13, int(r[1]), int(r[2]), 0, 0)),
+    "READ_MEM": (4, lambda r: (26, int(r[1]), int(r[2]), int(r[3]), 0)),
+    "WRITE_MEM": (3, lambda r: (15, int(r[1]), int(r[2]), 0, 0)),
+    "POW": (5, lambda r: (22, int(r[1]), int(r[2]), int(r[3]), int(r[4]))),
+}
+
+
+_OP_NAMES = {13: "LOAD_CONST", 26: "READ_MEM", 15: "WRITE_MEM", 22: "POW"}
+
+
+def ir_to_dict(instr: tuple) -> dict:
+    """
+    Readable form of one IR tuple for logs and the UI, e.g.
+    (13, 0, 123, 0, 0) -> {"cmd": "LOAD_CONST", "B": 0, "C": 123}
+    """
+    name = _OP_NAMES[instr[0]]
+    n_args = _TO_IR[name][0] - 1
+    return {"cmd": name, **dict(zip("BCDE", instr[1:1 + n_args]))}
 
 
 def to_ir(csv_rows):
@@ -118,53 +121,69 @@ def to_ir(csv_rows):
 
     Where:
       - B, C, D, E are integers (field meanings per spec above)
+
+    Returns a list of (A, B, C, D, E) tuples, A being the opcode.
     """
     ir = []
     for idx, row in enumerate(csv_rows):
         cmd = row[0].upper()
-
-        def need(n: int):
-            if len(row) != n:
-                raise ValueError(f"{cmd} expects {n-1} args, got {len(row)-1} at line {idx+1}: {row}")
-
-        if cmd == "LOAD_CONST":
-            need(3)
-            B = int(row[1])
-            C = int(row[2])
-            ir.append({"cmd": "LOAD_CONST", "B": B, "C": C})
-
-        elif cmd == "READ_MEM":
-            need(4)
-            B = int(row[1])
-            C = int(row[2])
-            D = int(row[3])
-            ir.append({"cmd": "READ_MEM", "B": B, "C": C, "D": D})
-
-        elif cmd == "WRITE_MEM":
-            need(3)
-            B = int(row[1])
-            C = int(row[2])
-            ir.append({"cmd": "WRITE_MEM", "B": B, "C": C})
-
-        elif cmd == "POW":
-            need(5)
-            B = int(row[1])
-            C = int(row[2])
-            D = int(row[3])
-            E = int(row[4])
-            ir.append({"cmd": "POW", "B": B, "C": C, "D": D, "E": E})
-
-        else:
+        entry = _TO_IR.get(cmd)
+        if entry is None:
             raise ValueError(f"Unknown command '{cmd}' at line {idx+1}: {row}")
 
+        n, build = entry
+        if len(row) != n:
+            raise ValueError(f"{cmd} expects {n-1} args, got {len(row)-1} at line {idx+1}: {row}")
+        ir.append(build(row))
+
     return ir
 
 
+# _FIELD_MASKS as arrays indexed by opcode, for the numpy encoder
+_C_MASK = np.zeros(32, dtype=np.int64)
+_D_MASK = np.zeros(32, dtype=np.int64)
+_E_MASK = np.zeros(32, dtype=np.int64)
+_ops = list(_FIELD_MASKS)
+_C_MASK[_ops], _D_MASK[_ops], _E_MASK[_ops] = zip(*_FIELD_MASKS.values())
+
+
+def assemble_vectorized(ir_list):
+    """
+    Encode the whole IR with numpy: the (A, B, C, D, E) tuples become one
+    N x 5 array and all words are packed with array shifts/ORs, using the
+    per-opcode masks above instead of a Python branch per instruction.
+    """
+    flat = np.fromiter(chain.from_iterable(ir_list), dtype=np.int64, count=5 * len(ir_list))
+    A, B, C, D, E = flat.reshape(-1, 5).T
+
+    unknown = ~np.isin(A, list(_FIELD_MASKS))
+    if unknown.any():
+        raise ValueError(f"Unknown IR opcode: {A[np.argmax(unknown)]}")
+
+    words = (A
+             | ((B & _M7) << 5)
+             | ((C & _C_MASK[A]) << 12)
+             | ((D & _D_MASK[A]) << 19)
+             | ((E & _E_MASK[A]) << 25))
+    return words.astype("<u4").tobytes()
+
+
 def assemble(ir_list):
-    binary = bytearray()
-    for instr in ir_list:
-        binary.extend(encode_instr(instr))
-    return binary
+    # the compiled and numpy encoders hold operands as 64-bit ints; an operand
+    # beyond that raises OverflowError there and is masked per instruction below
+    try:
+        if assemble_fast is not None:
+            return assemble_fast(ir_list)
+        if len(ir_list) >= VECTOR_MIN_INSTRS:
+            return assemble_vectorized(ir_list)
+    except OverflowError:
+        pass
+
+    buf = bytearray(len(ir_list) * INSTR_SIZE)
+    pack_into = _WORD.pack_into
+    for i, instr in enumerate(ir_list):
+        pack_into(buf, i * INSTR_SIZE, encode_instr(instr))
+    return bytes(buf)
 
 
 def fmt_bytes_hex(b: bytes):
@@ -184,7 +203,7 @@ def main():
     if args.test:
         print("=== IR ===")
         for i, instr in enumerate(ir):
-            print(f"{i:03}: {instr}")
+            print(f"{i:03}: {ir_to_dict(instr)}")
 
     binary = assemble(ir)
     with open(args.output, "wb") as f:
@@ -0,0 +1,20 @@
+import csv
+import io
+
+
+def iter_program_rows(source):
+    """
+    Yield assembler rows from CSV text (str) or an open text file, using a
+    single csv.reader. Cells are stripped; empty rows and rows whose first
+    cell starts with '#' (comments) are skipped.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    for row in csv.reader(source):
+        if not row:
+            continue
+        first = row[0].strip()
+        if not first or first.startswith("#"):
+            continue
+        yield [c.strip() for c in row]
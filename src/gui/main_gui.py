@@ -1,24 +1,62 @@
 import sys
 import traceback
-import csv
-import io
 
-from PySide6.QtCore import Slot, Signal, QObject, QThread
+import numpy as np
+from PySide6.QtCore import Slot, Signal, QObject, QThread, Qt, QAbstractTableModel, QModelIndex
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QLabel, QSpinBox,
+    QPushButton, QTableView, QLabel, QSpinBox,
     QFileDialog, QMessageBox, QLineEdit
 )
 
-from src.assembler import to_ir, assemble
+from src.assembler import to_ir, assemble, ir_to_dict
+from src.csv_io import iter_program_rows
 from src.gui_backend import run_binary_bytes
 
 
 class WorkerSignals(QObject):
-    finished = Signal(dict)   # payload: {'state': state, 'log': str, 'binary_len': int, 'dump_range': (start,end)}
+    finished = Signal(dict)   # payload: {'state': state, 'log': str, 'binary_len': int, 'dump_range': (start,end), 'dump': mem slice}
     error = Signal(str)       # payload: traceback text
 
 
+class MemoryDumpModel(QAbstractTableModel):
+    """
+    Read-only table over a slice of VM memory. The view only asks for the
+    rows it displays, so a new dump is a single model reset.
+    """
+    HEADERS = ("Addr", "Value")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._start = 0
+        self._values = np.zeros(0, dtype=np.uint32)
+
+    def set_dump(self, start: int, values):
+        self.beginResetModel()
+        self._start = start
+        self._values = values
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._values)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        if index.column() == 0:
+            return str(self._start + row)
+        return str(int(self._values[row]))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+
 class AssembleRunWorker(QThread):
     """
     Worker thread: performs CSV->IR->assemble->run, emits signals with results.
@@ -38,16 +76,7 @@ class AssembleRunWorker(QThread):
         return int(a.strip()), int(b.strip())
 
     def parse_csv_rows(self, text: str):
-        reader = csv.reader(io.StringIO(text))
-        rows = []
-        for row in reader:
-            if not row:
-                continue
-            first = (row[0] or "").strip()
-            if not first or first.startswith("#"):
-                continue
-            rows.append([c.strip() for c in row])
-        return rows
+        return list(iter_program_rows(text))
 
     def run(self):
         # This is executed in background thread: do not touch GUI here.
@@ -60,7 +89,7 @@ class AssembleRunWorker(QThread):
             rows = self.parse_csv_rows(self.csv_text)
             log("Converting CSV -> IR...")
             ir = to_ir(rows)
-            log("IR:\n" + "\n".join(f"{i:03}: {instr}" for i, instr in enumerate(ir)))
+            log("IR:\n" + "\n".join(f"{i:03}: {ir_to_dict(instr)}" for i, instr in enumerate(ir)))
 
             log("Assembling to bytes...")
             binary = assemble(ir)
@@ -78,7 +107,8 @@ class AssembleRunWorker(QThread):
                 "state": state,
                 "log": "\n".join(log_lines),
                 "binary_len": len(binary),
-                "dump_range": (start, end)
+                "dump_range": (start, end),
+                "dump": state["mem"][start:end + 1],
             }
             self.signals.finished.emit(payload)
         except Exception:
@@ -150,9 +180,9 @@ READ_MEM,0,1,0
 
         # Middle: Memory table
         main_layout.addWidget(QLabel("Memory dump:"))
-        self.mem_table = QTableWidget()
-        self.mem_table.setColumnCount(2)
-        self.mem_table.setHorizontalHeaderLabels(["Addr", "Value"])
+        self.mem_model = MemoryDumpModel(self)
+        self.mem_table = QTableView()
+        self.mem_table.setModel(self.mem_model)
         main_layout.addWidget(self.mem_table, stretch=2)
 
         # Bottom: log
@@ -200,7 +230,6 @@ READ_MEM,0,1,0
 
     @Slot(dict)
     def _on_worker_finished(self, payload: dict):
-        state = payload["state"]
         log_text = payload["log"]
         binary_len = payload["binary_len"]
         start, end = payload["dump_range"]
@@ -209,17 +238,7 @@ READ_MEM,0,1,0
         self.append_log(f"Assembled {binary_len} bytes")
         self.append_log("Program executed. Updating memory table...")
 
-        count = end - start + 1
-        self.mem_table.setRowCount(count)
-
-        mem = state.get("mem", [])
-        for i, addr in enumerate(range(start, end + 1)):
-            self.mem_table.setItem(i, 0, QTableWidgetItem(str(addr)))
-            try:
-                val = mem[addr]
-            except Exception:
-                val = "<out of range>"
-            self.mem_table.setItem(i, 1, QTableWidgetItem(str(val)))
+        self.mem_model.set_dump(start, payload["dump"])
 
         self.append_log("Memory dump updated")
         QMessageBox.information(self, "Success", "Program executed and memory dump updated.")
@@ -17,54 +17,238 @@
 # POW:       A=22, bits: A(0-4,5), B(5-11,7), C(12-18,7), D(19-24,6), E(25-31,7)
 #   op1 = mem[ regs[E] + D ]
 #   op2 = mem[ regs[B] ]
-#   regs[C] = pow(op1, op2)
+#   regs[C] = pow(op1, op2) mod 2^32
 
 import argparse
 from pathlib import Path
-import xml.etree.ElementTree as ET
 
-from src.utils import mask
+import numpy as np
+
+try:
+    from src.interpreter_jit import run_native
+except ImportError:  # numba is optional, fall back to the Python loop
+    run_native = None
 
 INSTR_SIZE = 4  # bytes per instruction / word
 
+# field masks (n-bit: (1 << n) - 1), precomputed for decoding
+_M5 = 0x1F
+_M6 = 0x3F
+_M7 = 0x7F
+_M11 = 0x7FF
+_M14 = 0x3FFF
+
 
 def _check_addr(addr: int, mem_size: int, what: str = "memory access"):
     if addr < 0 or addr >= mem_size:
         raise IndexError(f"{what}: address {addr} out of bounds (0..{mem_size-1})")
 
 
-def run_binary_bytes(code_bytes: bytes, mem_size: int = 1 << 16, regs_count: int = 32):
+# Field masks per opcode (0 = the instruction has no such field).
+# A is always bits 0-4 and B bits 5-11; C, D, E widths depend on the opcode.
+_C_MASK = [0] * 32
+_C_MASK[13], _C_MASK[26], _C_MASK[15], _C_MASK[22] = _M11, _M7, _M14, _M7
+_D_MASK = [0] * 32
+_D_MASK[26] = _D_MASK[22] = _M6
+_E_MASK = [0] * 32
+_E_MASK[22] = _M7
+
+
+def _decode(cmd_int: int):
+    """Split one instruction word into its (A, B, C, D, E) fields."""
+    A = cmd_int & _M5
+    return (
+        A,
+        (cmd_int >> 5) & _M7,
+        (cmd_int >> 12) & _C_MASK[A],
+        (cmd_int >> 19) & _D_MASK[A],
+        (cmd_int >> 25) & _E_MASK[A],
+    )
+
+
+def _decode_program(words: np.ndarray):
+    """
+    Decode all instruction words at once into per-field arrays
+    [A, B, C, D, E] (structure of arrays), indexed by pc.
+    """
+    w = words.astype(np.int64)
+    A = w & _M5
+    return [
+        A,
+        (w >> 5) & _M7,
+        (w >> 12) & np.array(_C_MASK)[A],
+        (w >> 19) & np.array(_D_MASK)[A],
+        (w >> 25) & np.array(_E_MASK)[A],
+    ]
+
+
+_OP_NAMES = {13: "LOAD_CONST", 26: "READ_MEM", 15: "WRITE_MEM", 22: "POW"}
+
+# opcodes whose B / C field is a register index
+_B_IS_REG = np.zeros(32, dtype=bool)
+_B_IS_REG[list(_OP_NAMES)] = True
+_C_IS_REG = np.zeros(32, dtype=bool)
+_C_IS_REG[[26, 22]] = True
+
+
+def _check_regs(A: int, B: int, C: int, E: int, regs_count: int):
+    name = _OP_NAMES.get(A)
+    if name is None:
+        return  # unknown opcodes are reported when executed
+    if B >= regs_count:
+        raise IndexError(f"{name}: register B={B} out of bounds")
+    if A in (26, 22) and C >= regs_count:
+        raise IndexError(f"{name}: register C={C} out of bounds")
+    if A == 22 and E >= regs_count:
+        raise IndexError(f"{name}: register E={E} out of bounds")
+
+
+def _first_bad_regs(words: np.ndarray, regs_count: int) -> int:
+    """
+    Index of the first word whose register fields are out of bounds, or
+    len(words) if there is none. Instructions before it can index regs
+    without bounds checks.
+    """
+    A, B, C, D, E = _decode_program(words)
+    # largest register index each instruction uses (-1 for unknown opcodes)
+    top = np.where(_B_IS_REG[A], B, -1)
+    top = np.maximum(top, np.where(_C_IS_REG[A], C, -1))
+    top = np.maximum(top, np.where(A == 22, E, -1))
+    bad = top >= regs_count
+    return int(np.argmax(bad)) if bad.any() else len(words)
+
+
+def _redecode_word(state: dict, addr: int):
+    # keep the decoded program in sync when code memory is overwritten
+    decoded = state.get("decoded")
+    if decoded is None:
+        return
+    mem = state["mem"]
+    for field, value in zip(decoded, _decode(int(mem[addr]))):
+        field[addr] = value
+
+    # words at or before pc have already run; for later ones keep "stop"
+    # (first instruction with bad register fields) up to date
+    stop = state["stop"]
+    if addr <= state["pc"] or addr > stop:
+        return
+    regs_count = len(state["regs"])
+    if addr < stop:
+        if _first_bad_regs(mem[addr:addr + 1], regs_count) == 0:
+            state["stop"] = addr
+    else:
+        # the faulting word itself was rewritten: find the next one
+        state["stop"] = addr + _first_bad_regs(mem[addr:state["program_len"]], regs_count)
+
+
+# Opcode handlers. Each one receives the already decoded fields plus the
+# interpreter state unpacked by the caller, so the hot loop does not repeat
+# state[...] lookups or bit decoding for every instruction. Register fields
+# are checked by the loop in run_binary_bytes (see _first_bad_regs), not here.
+
+def _op_load_const(B: int, C: int, D: int, E: int, regs: list, mem, mem_size: int, state: dict):
+    # B: reg addr, C: const
+    regs[B] = C
+
+
+def _op_read_mem(B: int, C: int, D: int, E: int, regs: list, mem, mem_size: int, state: dict):
+    # B: base reg addr, C: dest reg addr, D: offset
+    addr = regs[B] + D
+    _check_addr(addr, mem_size, "READ_MEM")
+    regs[C] = int(mem[addr])
+
+
+def _op_write_mem(B: int, C: int, D: int, E: int, regs: list, mem, mem_size: int, state: dict):
+    # B: src reg addr, C: mem addr
+    _check_addr(C, mem_size, "WRITE_MEM")
+    mem[C] = regs[B] & 0xFFFFFFFF  # memory cells are 32-bit words
+    if C < state["program_len"]:
+        _redecode_word(state, C)
+
+
+def _op_pow(B: int, C: int, D: int, E: int, regs: list, mem, mem_size: int, state: dict):
+    # B: reg addr for op2 address, C: dest reg, D: offset, E: base reg for op1 address
+    addr1 = regs[E] + D
+    _check_addr(addr1, mem_size, "POW operand1")
+    op1 = int(mem[addr1])
+
+    addr2 = regs[B]
+    _check_addr(addr2, mem_size, "POW operand2")
+    op2 = int(mem[addr2])
+
+    # Integer pow truncated to a 32-bit word; the 3-argument form never
+    # builds the full-precision result
+    regs[C] = pow(op1, op2, 1 << 32)
+
+
+_HANDLERS = {
+    13: _op_load_const,
+    26: _op_read_mem,
+    15: _op_write_mem,
+    22: _op_pow,
+}
+
+
+def run_binary_bytes(code_bytes: bytes, mem_size: int = 1 << 16, regs_count: int = 32,
+                     native: bool = True):
     """
     Run program from raw bytes (without reading a file).
     Program is loaded into mem starting at address 0 as 32-bit words.
+    native=False skips the Numba loop even when it is available.
     """
     if len(code_bytes) % INSTR_SIZE != 0:
         raise ValueError("Binary length must be multiple of 4 bytes (word-aligned instructions)")
 
-    program_words = [
-        int.from_bytes(code_bytes[i:i + INSTR_SIZE], "little")
-        for i in range(0, len(code_bytes), INSTR_SIZE)
-    ]
+    words = np.frombuffer(code_bytes, dtype="<u4")
 
     state = {
         "regs": [0] * regs_count,
-        "mem": [0] * mem_size,
+        "mem": np.zeros(mem_size, dtype=np.uint32),
         "pc": 0,
-        "program_len": len(program_words),
+        "program_len": len(words),
     }
 
     if state["program_len"] > mem_size:
         raise MemoryError(f"Program too large: {state['program_len']} words, mem_size={mem_size}")
 
     # load program into combined memory
-    for i, w in enumerate(program_words):
-        state["mem"][i] = w
+    state["mem"][:len(words)] = words
 
     # execute
-    while state["pc"] < state["program_len"]:
-        instr = state["mem"][state["pc"]]
-        state["pc"] += 1
-        decode_and_execute_one(instr, state)
+    regs = state["regs"]
+    mem = state["mem"]
+    handlers = _HANDLERS
+    pc = state["pc"]
+    program_len = state["program_len"]
+
+    if native and run_native is not None:
+        native_regs = np.zeros(regs_count, dtype=np.int64)
+        pc = run_native(mem, native_regs, pc, program_len)
+        regs[:] = native_regs.tolist()
+
+    # finish in Python whatever the native loop left (faults)
+    if pc < program_len:
+        # decode from mem, not code_bytes: the native loop may have rewritten code
+        fields = _decode_program(mem[:program_len])
+        # plain lists: indexing them from the Python loop is much cheaper
+        # than creating a numpy scalar per element
+        state["decoded"] = [f.tolist() for f in fields]
+        ops, Bs, Cs, Ds, Es = state["decoded"]
+        # registers are checked once, up front: everything before "stop" runs
+        # unchecked and the instruction at "stop" raises when reached.
+        # WRITE_MEM into later code moves "stop" (_redecode_word).
+        state["stop"] = pc + _first_bad_regs(mem[pc:program_len], regs_count)
+        while pc < program_len:
+            state["pc"] = pc
+            handler = handlers.get(ops[pc])
+            if handler is None:
+                raise ValueError(f"Unknown opcode A={ops[pc]}")
+            if pc == state["stop"]:
+                _check_regs(ops[pc], Bs[pc], Cs[pc], Es[pc], regs_count)
+            handler(Bs[pc], Cs[pc], Ds[pc], Es[pc], regs, mem, mem_size, state)
+            pc += 1
+        del state["decoded"], state["stop"]
+    state["pc"] = pc
 
     return state
 
@@ -74,73 +258,46 @@ def decode_and_execute_one(cmd_int: int, state: dict):
     cmd_int: 32-bit instruction word
     state keys:
       regs: list[int]
-      mem:  list[int] (combined)
+      mem:  np.ndarray[uint32] (combined)
       pc:   int (word index)
       program_len: int (in words)
     """
-    regs = state["regs"]
     mem = state["mem"]
-    mem_size = len(mem)
+    regs = state["regs"]
+    A, B, C, D, E = _decode(cmd_int)
 
-    A = cmd_int & mask(5)  # A is 5 bits in variant 21 (0..4)
+    handler = _HANDLERS.get(A)
+    if handler is None:
+        raise ValueError(f"Unknown opcode A={A}")
+    _check_regs(A, B, C, E, len(regs))
+    handler(B, C, D, E, regs, mem, len(mem), state)
 
-    if A == 13:  # LOAD_CONST
-        B = (cmd_int >> 5) & mask(7)     # reg addr
-        C = (cmd_int >> 12) & mask(11)   # const
-        if B < 0 or B >= len(regs):
-            raise IndexError(f"LOAD_CONST: register B={B} out of bounds")
-        regs[B] = int(C)
-        return
 
-    if A == 26:  # READ_MEM
-        B = (cmd_int >> 5) & mask(7)     # base reg addr
-        C = (cmd_int >> 12) & mask(7)    # dest reg addr
-        D = (cmd_int >> 19) & mask(6)    # offset
-        if B < 0 or B >= len(regs):
-            raise IndexError(f"READ_MEM: register B={B} out of bounds")
-        if C < 0 or C >= len(regs):
-            raise IndexError(f"READ_MEM: register C={C} out of bounds")
-        addr = int(regs[B]) + int(D)
-        _check_addr(addr, mem_size, "READ_MEM")
-        regs[C] = int(mem[addr])
-        return
+def run_program_bytes(code_bytes: bytes, mem_size: int = 1 << 16, regs_count: int = 32,
+                      dump_range: tuple[int, int] | None = None):
+    """
+    Runs an in-memory binary. Returns (state, dump) where dump is the list of
+    cell values for dump_range (dump[i] is address start + i), or None when
+    no range is given.
+    """
+    if len(code_bytes) % INSTR_SIZE != 0:
+        raise ValueError("Binary length must be multiple of 4 bytes (word-aligned instructions)")
 
-    if A == 15:  # WRITE_MEM
-        B = (cmd_int >> 5) & mask(7)     # src reg addr
-        C = (cmd_int >> 12) & mask(14)   # mem addr
-        if B < 0 or B >= len(regs):
-            raise IndexError(f"WRITE_MEM: register B={B} out of bounds")
-        addr = int(C)
-        _check_addr(addr, mem_size, "WRITE_MEM")
-        mem[addr] = int(regs[B])
-        return
+    # validate the range before running so a bad request fails fast
+    if dump_range is not None:
+        start, end = dump_range
+        if start < 0 or end < 0 or start > end:
+            raise ValueError("Invalid dump range")
+        if end >= mem_size:
+            raise IndexError("Dump range out of bounds")
 
-    if A == 22:  # POW
-        B = (cmd_int >> 5) & mask(7)     # reg addr for op2 address
-        C = (cmd_int >> 12) & mask(7)    # dest reg
-        D = (cmd_int >> 19) & mask(6)    # offset
-        E = (cmd_int >> 25) & mask(7)    # base reg for op1 address
-
-        if B < 0 or B >= len(regs):
-            raise IndexError(f"POW: register B={B} out of bounds")
-        if C < 0 or C >= len(regs):
-            raise IndexError(f"POW: register C={C} out of bounds")
-        if E < 0 or E >= len(regs):
-            raise IndexError(f"POW: register E={E} out of bounds")
-
-        addr1 = int(regs[E]) + int(D)
-        _check_addr(addr1, mem_size, "POW operand1")
-        op1 = int(mem[addr1])
-
-        addr2 = int(regs[B])
-        _check_addr(addr2, mem_size, "POW operand2")
-        op2 = int(mem[addr2])
-
-        # Integer pow (store as int word)
-        regs[C] = int(pow(op1, op2))
-        return
+    state = run_binary_bytes(code_bytes, mem_size=mem_size, regs_count=regs_count)
 
-    raise ValueError(f"Unknown opcode A={A}")
+    dump = None
+    if dump_range is not None:
+        dump = state["mem"][start:end + 1].tolist()
+
+    return state, dump
 
 
 def run_program(bin_path: str, mem_size: int = 1 << 16, regs_count: int = 32,
@@ -149,30 +306,23 @@ def run_program(bin_path: str, mem_size: int = 1 << 16, regs_count: int = 32,
     if not p.exists():
         raise FileNotFoundError(bin_path)
 
-    code_bytes = p.read_bytes()
-    if len(code_bytes) % INSTR_SIZE != 0:
-        raise ValueError("Binary length must be multiple of 4 bytes (word-aligned instructions)")
-
-    # Load & run via helper
-    state = run_binary_bytes(code_bytes, mem_size=mem_size, regs_count=regs_count)
+    if dump_xml is None:
+        dump_range = None
+    state, dump = run_program_bytes(p.read_bytes(), mem_size=mem_size,
+                                    regs_count=regs_count, dump_range=dump_range)
 
     # dump XML if requested
-    if dump_xml is not None and dump_range is not None:
-        start, end = dump_range
-        if start < 0 or end < 0 or start > end:
-            raise ValueError("Invalid dump range")
-        if end >= mem_size:
-            raise IndexError("Dump range out of bounds")
-
-        root = ET.Element("memory")
-        for addr in range(start, end + 1):
-            cell = ET.SubElement(root, "cell")
-            cell.set("address", str(addr))
-            cell.set("value", str(state["mem"][addr]))
-
-        tree = ET.ElementTree(root)
+    if dump is not None:
+        # write the XML text directly instead of building an ElementTree:
+        # cells only carry integers, so nothing needs escaping
         Path(dump_xml).parent.mkdir(parents=True, exist_ok=True)
-        tree.write(dump_xml, encoding="utf-8", xml_declaration=True)
+        with open(dump_xml, "w", encoding="utf-8") as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n<memory>\n")
+            f.writelines(
+                f'<cell address="{addr}" value="{val}" />\n'
+                for addr, val in enumerate(dump, dump_range[0])
+            )
+            f.write("</memory>\n")
 
     return state
 
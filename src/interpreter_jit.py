@@ -0,0 +1,76 @@
+# interpreter_jit.py
+# Native (Numba) version of the interpreter fetch/execute loop for Variant #21.
+#
+# Optional: src/interpreter.py uses it only when numba is installed.
+# The loop executes instructions until the program ends or it reaches an
+# instruction that faults (bad register/address, unknown opcode). It then
+# returns that pc and the Python loop takes over, raising the usual errors.
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _pow32(base, exp):
+    # pow(base, exp) mod 2^32 by squaring; int64 products may wrap but
+    # their low 32 bits are still exact
+    result = 1
+    base &= 0xFFFFFFFF
+    while exp > 0:
+        if exp & 1:
+            result = (result * base) & 0xFFFFFFFF
+        base = (base * base) & 0xFFFFFFFF
+        exp >>= 1
+    return result
+
+
+@njit(cache=True)
+def run_native(mem, regs, pc, program_len):
+    """
+    mem:  np.ndarray[uint32] (combined memory)
+    regs: np.ndarray[int64]
+    Returns pc of the first instruction that was not executed.
+    """
+    mem_size = mem.shape[0]
+    regs_count = regs.shape[0]
+
+    while pc < program_len:
+        instr = np.int64(mem[pc])
+        A = instr & 0x1F
+        B = (instr >> 5) & 0x7F
+        if B >= regs_count:
+            return pc
+
+        if A == 13:  # LOAD_CONST
+            regs[B] = (instr >> 12) & 0x7FF
+
+        elif A == 26:  # READ_MEM
+            C = (instr >> 12) & 0x7F
+            addr = regs[B] + ((instr >> 19) & 0x3F)
+            if C >= regs_count or addr < 0 or addr >= mem_size:
+                return pc
+            regs[C] = mem[addr]
+
+        elif A == 15:  # WRITE_MEM
+            C = (instr >> 12) & 0x3FFF
+            if C >= mem_size:
+                return pc
+            mem[C] = regs[B] & 0xFFFFFFFF
+
+        elif A == 22:  # POW
+            C = (instr >> 12) & 0x7F
+            E = (instr >> 25) & 0x7F
+            if C >= regs_count or E >= regs_count:
+                return pc
+            addr1 = regs[E] + ((instr >> 19) & 0x3F)
+            addr2 = regs[B]
+            if addr1 < 0 or addr1 >= mem_size or addr2 < 0 or addr2 >= mem_size:
+                return pc
+            regs[C] = _pow32(np.int64(mem[addr1]), np.int64(mem[addr2]))
+
+        else:
+            return pc
+
+        pc += 1
+
+    return pc
@@ -1,12 +1,13 @@
-import csv
+import json
 import re
-import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Optional, Tuple
 
-from src.assembler import to_ir, assemble
-from src.interpreter import run_program
+from src.assembler import to_ir, assemble, assemble_vectorized
+from src.csv_io import iter_program_rows
+from src.interpreter import run_binary_bytes, run_native
+from src.web.app import _assemble_run_frames
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]  # tools -> src -> edu-vm
 TESTS_DIR = PROJECT_ROOT / "tests"
@@ -15,9 +16,14 @@ MEM_SIZE = 65536
 REGS = 32
 
 
-_BYTES_RE = re.compile(r"^\s*#\s*EXPECT\s+BYTES\s*:\s*(.+?)\s*$", re.IGNORECASE)
-_MEM_RE = re.compile(r"^\s*#\s*EXPECT\s+MEM\[(\d+)\]\s*=\s*(-?\d+)\s*$", re.IGNORECASE)
-_REG_RE = re.compile(r"^\s*#\s*EXPECT\s+REG\[(\d+)\]\s*=\s*(-?\d+)\s*$", re.IGNORECASE)
+_EXPECT_RE = re.compile(
+    r"^\s*#\s*EXPECT\s+(?:"
+    r"BYTES\s*:\s*(?P<bytes>.+?)"
+    r"|MEM\[(?P<maddr>\d+)\]\s*=\s*(?P<mval>-?\d+)"
+    r"|REG\[(?P<raddr>\d+)\]\s*=\s*(?P<rval>-?\d+)"
+    r")\s*$",
+    re.IGNORECASE,
+)
 
 
 @dataclass
@@ -40,48 +46,33 @@ def parse_expectations_and_rows(path: Path) -> Tuple[Expectations, List[List[str
       - CSV rows (non-comment, non-empty) for assembler
     """
     exp = Expectations()
-    rows: List[List[str]] = []
 
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        # Pass 1: expectations from comment lines
         for line in f:
-            raw = line.rstrip("\n")
+            raw = line.rstrip("\r\n")
             stripped = raw.strip()
 
-            if not stripped:
+            # cheap checks first: most lines are not expectations
+            if not stripped.startswith("#") or "EXPECT" not in stripped.upper():
                 continue
 
-            # Parse expectations from comments
-            if stripped.startswith("#"):
-                m = _BYTES_RE.match(raw)
-                if m:
-                    # Allow spaces; hex bytes can be "4D F6 13 00" or "4DF61300"
-                    hex_part = m.group(1).replace(" ", "")
-                    exp.expected_bytes = bytes.fromhex(hex_part)
-                    continue
-
-                m = _MEM_RE.match(raw)
-                if m:
-                    addr = int(m.group(1))
-                    val = int(m.group(2))
-                    exp.expected_mem.append((addr, val))
-                    continue
-
-                m = _REG_RE.match(raw)
-                if m:
-                    idx = int(m.group(1))
-                    val = int(m.group(2))
-                    exp.expected_reg.append((idx, val))
-                    continue
-
-                # Other comments ignored
+            m = _EXPECT_RE.match(raw)
+            if m is None:
                 continue
 
-            # Non-comment: parse as CSV row
-            reader = csv.reader([raw])
-            row = next(reader, [])
-            row = [c.strip() for c in row if c is not None]
-            if row:
-                rows.append(row)
+            if m.group("bytes") is not None:
+                # Allow spaces; hex bytes can be "4D F6 13 00" or "4DF61300"
+                hex_part = m.group("bytes").replace(" ", "")
+                exp.expected_bytes = bytes.fromhex(hex_part)
+            elif m.group("maddr") is not None:
+                exp.expected_mem.append((int(m.group("maddr")), int(m.group("mval"))))
+            else:
+                exp.expected_reg.append((int(m.group("raddr")), int(m.group("rval"))))
+
+        # Pass 2: program rows through the shared CSV reader
+        f.seek(0)
+        rows: List[List[str]] = list(iter_program_rows(f))
 
     return exp, rows
 
@@ -112,6 +103,20 @@ def assert_expected_state(state: dict, exp: Expectations):
             raise AssertionError(f"REG[{idx}] mismatch: expected {val}, got {regs[idx]}")
 
 
+def assert_web_run(csv_path: Path, exp: Expectations):
+    addrs = [addr for addr, _ in exp.expected_mem]
+    start, end = (min(addrs), max(addrs)) if addrs else (0, 0)
+
+    csv_text = csv_path.read_text(encoding="utf-8")
+    frames = [json.loads(f) for f in _assemble_run_frames(csv_text, MEM_SIZE, REGS, (start, end))]
+    last = frames[-1]
+    if last["stage"] != "done":
+        raise AssertionError(f"web run failed: {last.get('error')}")
+
+    values = [v for f in frames if f["stage"] == "dump_chunk" for v in f["values"]]
+    assert_expected_state({"mem": [0] * start + values, "regs": last["registers"]}, exp)
+
+
 def run_test(csv_path: Path):
     print(f"\n=== {csv_path.name} ===")
 
@@ -119,6 +124,15 @@ def run_test(csv_path: Path):
     ir = to_ir(rows)
     binary = assemble(ir)
 
+    # assemble() picks the Cython or numpy encoder by availability and size;
+    # check the numpy one against it too, so it is covered either way
+    try:
+        vectorized = assemble_vectorized(ir)
+    except OverflowError:
+        vectorized = binary  # operands beyond 64 bits are masked by the scalar path only
+    if vectorized != binary:
+        raise AssertionError("assemble_vectorized disagrees with assemble")
+
     # If EXPECT BYTES present: compare against the whole binary.
     # For spec tests, make the file contain only ONE instruction.
     if exp.expected_bytes is not None:
@@ -137,21 +151,16 @@ def run_test(csv_path: Path):
 
     # Run interpreter if we have runtime expectations or if we just want a smoke test.
     # (You can skip interpreter when only EXPECT BYTES is present, but running is harmless.)
-    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
-        f.write(binary)
-        bin_path = f.name
-
-    state = run_program(
-        bin_path,
-        mem_size=MEM_SIZE,
-        regs_count=REGS,
-        dump_xml=None,
-        dump_range=None,
-    )
-
-    # Check MEM/REG expectations
-    if exp.expected_mem or exp.expected_reg:
-        assert_expected_state(state, exp)
+    # With numba installed, also run the pure-Python loop so both stay covered.
+    for native in ((True, False) if run_native is not None else (False,)):
+        state = run_binary_bytes(binary, mem_size=MEM_SIZE, regs_count=REGS, native=native)
+
+        # Check MEM/REG expectations
+        if exp.expected_mem or exp.expected_reg:
+            assert_expected_state(state, exp)
+
+    # Same program through the web endpoint's pipeline (CSV text -> NDJSON frames)
+    assert_web_run(csv_path, exp)
 
     print("OK")
     return state
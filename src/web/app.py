@@ -1,15 +1,159 @@
 import io
-import csv
-import traceback
+import os
+import json
+import hashlib
+import multiprocessing
 import tempfile
-from flask import Flask, render_template, request, jsonify, send_file
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from flask import Flask, Response, render_template, request, send_file
 
-from src.assembler import to_ir, assemble
-from src.interpreter import run_program, parse_range
+from src.assembler import FORMAT_VERSION, to_ir, assemble, ir_to_dict
+from src.csv_io import iter_program_rows
+from src.interpreter import run_program_bytes, parse_range
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json works the same, just slower
+    orjson = None
 
 app = Flask(__name__)
 
 
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. IR operands wider than 64 bits, which only json handles
+    return json.dumps(obj).encode('utf-8')
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def ojson(obj):
+    """jsonify() replacement serializing with orjson when available."""
+    return app.response_class(_dumps(obj), mimetype='application/json')
+
+
+# on-disk tier of the compile cache: {key}.bin + {key}.ir.json, keyed by
+# _cache_key so edited sources (or a new assembler format) simply miss.
+# Holds at most CACHE_MAX_ENTRIES programs, the oldest are evicted first.
+CACHE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "assemble"
+CACHE_MAX_ENTRIES = 1024
+
+
+def _cache_read(key: str):
+    try:
+        binary = (CACHE_DIR / f"{key}.bin").read_bytes()
+        # stdlib json: orjson would turn operands wider than 64 bits into floats
+        ir = json.loads((CACHE_DIR / f"{key}.ir.json").read_bytes())
+        ir = tuple(tuple(entry) for entry in ir)
+    except (OSError, ValueError, TypeError):
+        return None  # missing or corrupt: recompiled and rewritten by the caller
+    return ir, binary
+
+
+def _cache_write_atomic(path: Path, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _cache_evict():
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.bin'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.name[:-len('.bin')]))
+                except OSError:
+                    pass  # removed concurrently
+    if len(entries) <= CACHE_MAX_ENTRIES:
+        return
+    entries.sort()
+    for _, key in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+        # .bin first, so a reader never finds a .bin without its IR
+        for name in (f"{key}.bin", f"{key}.ir.json"):
+            try:
+                os.unlink(CACHE_DIR / name)
+            except OSError:
+                pass
+
+
+def _cache_write(key: str, ir, binary: bytes):
+    # best effort: a read-only or full disk, or an IR that cannot be
+    # serialized, only costs the cache
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # IR first: a reader needs both files and checks the .bin first
+        _cache_write_atomic(CACHE_DIR / f"{key}.ir.json", _dumps(ir))
+        _cache_write_atomic(CACHE_DIR / f"{key}.bin", binary)
+        _cache_evict()
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def _cache_key(csv_bytes: bytes) -> str:
+    # the assembler format version is part of the key, so cached programs
+    # from an older to_ir / encoder are never served; also the download ETag
+    h = hashlib.blake2b(csv_bytes, digest_size=20, person=b"uvm21-v%d" % FORMAT_VERSION)
+    return h.hexdigest()
+
+
+# in-process tier: _cache_key -> (IR, binary), least recently used first.
+# Keyed by digest rather than by the source itself, so large CSVs are not
+# kept alive as cache keys.
+_COMPILE_CACHE = OrderedDict()
+_COMPILE_CACHE_SIZE = 128
+_COMPILE_LOCK = threading.Lock()
+
+
+def _compile(csv_bytes: bytes, key: str | None = None):
+    """
+    CSV source -> (IR, binary). Pure, so identical sources are served from
+    the cache. key is _cache_key(csv_bytes) if the caller already has it.
+    """
+    if key is None:
+        key = _cache_key(csv_bytes)
+
+    with _COMPILE_LOCK:
+        hit = _COMPILE_CACHE.get(key)
+        if hit is not None:
+            _COMPILE_CACHE.move_to_end(key)
+            return hit
+
+    result = _cache_read(key)
+    if result is None:
+        csv_rows = list(iter_program_rows(csv_bytes.decode('utf-8')))
+
+        ir = tuple(to_ir(csv_rows))
+        result = ir, assemble(ir)
+        _cache_write(key, *result)
+
+    with _COMPILE_LOCK:
+        _COMPILE_CACHE[key] = result
+        if len(_COMPILE_CACHE) > _COMPILE_CACHE_SIZE:
+            _COMPILE_CACHE.popitem(last=False)
+    return result
+
+
 @app.route('/')
 def index():
     """Главная страница с редактором"""
@@ -19,80 +163,158 @@ def index():
 # ============================
 # Assemble + Run (CSV -> BIN)
 # ============================
+# per-request caps, so a request cannot make the server allocate or ship
+# arbitrarily much; register fields are 7 bits, so 128 registers suffice
+MAX_MEM_SIZE = 1 << 24
+MAX_REGS = 128
+MAX_DUMP_CELLS = 1 << 16
+
+
+def _run_params(data):
+    """Validates assemble_run input; raises ValueError with a user-facing message."""
+    csv_text = data.get('csv', '')
+    if not isinstance(csv_text, str):
+        raise ValueError("csv must be a string")
+
+    mem_size = int(data.get('mem_size', 65536))
+    regs_count = int(data.get('regs_count', 32))
+    if not 0 < mem_size <= MAX_MEM_SIZE:
+        raise ValueError(f"mem_size must be in 1..{MAX_MEM_SIZE}")
+    if not 0 < regs_count <= MAX_REGS:
+        raise ValueError(f"regs_count must be in 1..{MAX_REGS}")
+
+    start, end = parse_range(data.get('dump_range', '100-220'))
+    if start > end:
+        raise ValueError("Invalid dump range")
+    if start < 0 or end >= mem_size:
+        raise ValueError(f"dump_range must lie within 0..{mem_size - 1}")
+    if end - start + 1 > MAX_DUMP_CELLS:
+        raise ValueError(f"dump_range may cover at most {MAX_DUMP_CELLS} cells")
+
+    return csv_text, mem_size, regs_count, (start, end)
+
+
 @app.route('/api/assemble_run', methods=['POST'])
 def api_assemble_run():
+    """
+    Streams newline-delimited JSON frames, so the page can show the IR
+    before the program has run:
+      {"stage": "ir", ...}          IR and binary, right after assembling
+      {"stage": "dump_chunk", ...}  memory dump, DUMP_CHUNK cells per frame
+      {"stage": "done", ...}        registers and log
+      {"stage": "error", ...}       instead of the remaining frames on failure
+    Invalid parameters are rejected up front with a 400 JSON error.
+    """
     try:
-        data = request.json
+        params = _run_params(_loads(request.get_data()))
+    except Exception as e:
+        return ojson({"success": False, "error": str(e)}), 400
 
-        csv_text = data.get('csv', '')
-        mem_size = int(data.get('mem_size', 65536))
-        regs_count = int(data.get('regs_count', 32))
-        dump_range_text = data.get('dump_range', '100-220')
+    return app.response_class(_assemble_run_frames(*params), mimetype='application/x-ndjson')
+
+
+DUMP_CHUNK = 1024
+
+# Programs run in a process pool: the interpreter is CPU-bound, so in the
+# server's own process one long run would hold the GIL for every request.
+# The pool is created on first use (main.py imports this module in every mode).
+# Workers are not forked from the server: forking a process that runs request
+# threads can deadlock the child on a lock some other thread held.
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+RUN_TIMEOUT = 60  # seconds
+
+
+def _stop_workers(executor):
+    terminate = getattr(executor, "terminate_workers", None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    for proc in list((executor._processes or {}).values()):
+        proc.terminate()
+
+
+def _executor(broken=None, stop=False):
+    """Returns the shared pool; replaces it first if it is `broken`,
+    terminating its workers when `stop` is set."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR is broken:
+            if broken is not None:
+                if stop:
+                    _stop_workers(broken)  # before shutdown, which forgets the workers
+                broken.shutdown(wait=False, cancel_futures=True)
+            _EXECUTOR = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=_MP_CONTEXT)
+        return _EXECUTOR
+
+
+def _run_worker(binary: bytes, mem_size: int, regs_count: int, dump_range):
+    # runs in a pool process; ship back plain lists only, not the whole memory
+    state, dump = run_program_bytes(binary, mem_size=mem_size, regs_count=regs_count,
+                                    dump_range=dump_range)
+    return state["regs"], dump
 
-        # --- CSV -> rows ---
-        reader = csv.reader(io.StringIO(csv_text))
-        csv_rows = [row for row in reader if row and not row[0].strip().startswith('#')]
 
-        # --- CSV -> IR ---
-        ir = to_ir(csv_rows)
+def _run_in_pool(*args):
+    executor = _executor()
+    try:
+        try:
+            return executor.submit(_run_worker, *args).result(timeout=RUN_TIMEOUT)
+        except BrokenProcessPool:
+            # a worker died (OOM kill, native crash); once a worker is lost the
+            # whole pool refuses work, so replace it and retry once
+            executor = _executor(broken=executor)
+            return executor.submit(_run_worker, *args).result(timeout=RUN_TIMEOUT)
+    except TimeoutError:
+        # a running task cannot be cancelled and would hold its worker for good;
+        # runs sharing the old pool fail over to the new one via the retry above
+        _executor(broken=executor, stop=True)
+        raise
 
-        # --- IR -> binary ---
-        binary = assemble(ir)
 
-        # --- temp files ---
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.bin') as f:
-            f.write(binary)
-            temp_bin_path = f.name
+def _frame(obj) -> bytes:
+    return _dumps(obj) + b"\n"
 
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.xml') as f:
-            temp_xml_path = f.name
 
-        dump_range = parse_range(dump_range_text)
+def _assemble_run_frames(csv_text: str, mem_size: int, regs_count: int, dump_range):
+    try:
+        # --- CSV -> IR -> binary (cached) ---
+        ir, binary = _compile(csv_text.encode('utf-8'))
+
+        yield _frame({
+            "stage": "ir",
+            "ir": [ir_to_dict(instr) for instr in ir],
+            "binary_size": len(binary),
+            "binary_hex": binary.hex(),
+        })
 
+        # --- run interpreter in a worker process ---
         try:
-            # --- run interpreter ---
-            state = run_program(
-                temp_bin_path,
-                mem_size=mem_size,
-                regs_count=regs_count,
-                dump_xml=temp_xml_path,
-                dump_range=dump_range
-            )
-
-            # --- read XML dump ---
-            import xml.etree.ElementTree as ET
-
-            tree = ET.parse(temp_xml_path)
-            root = tree.getroot()
-
-            mem_dump = []
-            for cell in root.findall("cell"):
-                mem_dump.append({
-                    "address": int(cell.get("address")),
-                    "value": int(cell.get("value"))
-                })
-
-            return jsonify({
-                "success": True,
-                "ir": ir,
-                "binary_size": len(binary),
-                "binary_hex": binary.hex(),
-                "mem_dump": mem_dump,
-                "registers": state["regs"],
-                "log": f"Assembled {len(binary)} bytes, executed successfully."
+            regs, dump = _run_in_pool(binary, mem_size, regs_count, dump_range)
+        except TimeoutError:
+            raise RuntimeError(f"Execution did not finish within {RUN_TIMEOUT} s and was stopped") from None
+
+        # parallel arrays rather than one {address, value} object per cell
+        start = dump_range[0]
+        for i in range(0, len(dump), DUMP_CHUNK):
+            values = dump[i:i + DUMP_CHUNK]
+            yield _frame({
+                "stage": "dump_chunk",
+                "addresses": list(range(start + i, start + i + len(values))),
+                "values": values,
             })
 
-        finally:
-            try:
-                import os
-                os.unlink(temp_bin_path)
-                os.unlink(temp_xml_path)
-            except Exception:
-                pass
+        yield _frame({
+            "stage": "done",
+            "registers": regs,
+            "log": f"Assembled {len(binary)} bytes, executed successfully."
+        })
 
     except Exception as e:
-        return jsonify({
-            "success": False,
+        yield _frame({
+            "stage": "error",
             "error": str(e),
             "traceback": traceback.format_exc()
         })
@@ -104,24 +326,34 @@ def api_assemble_run():
 @app.route('/api/download_binary', methods=['POST'])
 def api_download_binary():
     try:
-        data = request.json
+        data = _loads(request.get_data())
         csv_text = data.get('csv', '')
 
-        reader = csv.reader(io.StringIO(csv_text))
-        csv_rows = [row for row in reader if row and not row[0].strip().startswith('#')]
+        csv_bytes = csv_text.encode('utf-8')
 
-        ir = to_ir(csv_rows)
-        binary = assemble(ir)
+        # the binary is a pure function of the source and the assembler
+        # format, which is exactly the compile cache key, so it is a strong
+        # ETag; werkzeug only evaluates conditionals for GET/HEAD, so
+        # If-None-Match on this POST is checked here, before compiling
+        etag = _cache_key(csv_bytes)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        _, binary = _compile(csv_bytes, etag)
 
         return send_file(
             io.BytesIO(binary),
             mimetype='application/octet-stream',
             as_attachment=True,
-            download_name='program.bin'
+            download_name='program.bin',
+            etag=etag,
+            conditional=True
         )
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return ojson({'success': False, 'error': str(e)})
 
 
 # ============================
@@ -130,7 +362,7 @@ def api_download_binary():
 @app.route('/api/save_csv', methods=['POST'])
 def api_save_csv():
     try:
-        data = request.json
+        data = _loads(request.get_data())
         csv_text = data.get('csv', '')
         filename = data.get('filename', 'program.csv')
 
@@ -145,16 +377,14 @@ def api_save_csv():
         )
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return ojson({'success': False, 'error': str(e)})
 
 
 # ============================
 # Examples (CSV)
 # ============================
-@app.route('/api/example/<example_name>')
-def api_example(example_name):
-    examples = {
-        "load_store": """# write 123 -> mem[100], read back to R1
+EXAMPLES = {
+    "load_store": """# write 123 -> mem[100], read back to R1
 LOAD_CONST,0,123
 WRITE_MEM,0,100
 
@@ -162,7 +392,7 @@ LOAD_CONST,2,100
 READ_MEM,2,1,0
 """,
 
-        "pow_simple": """# pow(2,3)=8 -> mem[800]
+    "pow_simple": """# pow(2,3)=8 -> mem[800]
 # MEM[600] = 2
 LOAD_CONST,0,2
 WRITE_MEM,0,600
@@ -181,7 +411,7 @@ POW,11,12,0,10
 WRITE_MEM,12,800
 """,
 
-        "copy_array": """# init source 300..302 then copy to 400..402
+    "copy_array": """# init source 300..302 then copy to 400..402
 LOAD_CONST,5,11
 WRITE_MEM,5,300
 LOAD_CONST,5,22
@@ -200,12 +430,20 @@ WRITE_MEM,3,401
 READ_MEM,0,4,2
 WRITE_MEM,4,402
 """
-    }
+}
+
+EXAMPLES_JSON = {
+    name: _dumps({"success": True, "csv": text})
+    for name, text in EXAMPLES.items()
+}
+EXAMPLE_NOT_FOUND_JSON = _dumps({"success": False, "error": "Example not found"})
 
-    if example_name in examples:
-        return jsonify({"success": True, "csv": examples[example_name]})
-    else:
-        return jsonify({"success": False, "error": "Example not found"})
+
+@app.route('/api/example/<example_name>')
+def api_example(example_name):
+    # bodies are static, serialized once at import
+    body = EXAMPLES_JSON.get(example_name, EXAMPLE_NOT_FOUND_JSON)
+    return Response(body, mimetype='application/json')
 
 
 def start():